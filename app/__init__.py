@@ -2,9 +2,12 @@ from flask import Flask, jsonify
 from flask_pymongo import PyMongo
 from flask_cors import CORS
 from .config import config
+from .utils.profiling import request_profiler
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import atexit
 import os
+import queue
 
 mongo = PyMongo()
 
@@ -16,14 +19,26 @@ def create_app(config_name='default'):
         if not os.path.exists('logs'):
             os.mkdir('logs')
 
-        file_handler = RotatingFileHandler('logs/app.log', maxBytes=10240, backupCount=10)
+        file_handler = RotatingFileHandler('logs/app.log', maxBytes=app.config['LOG_MAX_BYTES'],
+                                           backupCount=app.config['LOG_BACKUP_COUNT'])
         file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
         file_handler.setLevel(logging.INFO)
 
-        app.logger.addHandler(file_handler)
+        # Request and FFmpeg reader threads only enqueue records; a background
+        # listener does the file writes and rotation off the hot path
+        log_queue = queue.Queue(-1)
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.setLevel(logging.INFO)
+        log_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        log_listener.start()
+        atexit.register(log_listener.stop)
+
+        app.logger.addHandler(queue_handler)
         app.logger.setLevel(logging.INFO)
         app.logger.info('Application startup successfully !')
 
+    # Profiling hooks register a Mongo command listener, so they must precede the client
+    request_profiler.init_app(app)
     mongo.init_app(app)
     CORS(app, origins=app.config['CORS_ORIGINS'])
 
@@ -31,10 +46,12 @@ def create_app(config_name='default'):
     from app.routes.overlays import overlays_bp
     from app.routes.streams import streams_bp
     from app.routes.settings import settings_bp
+    from app.routes.admin import admin_bp
 
     app.register_blueprint(overlays_bp, url_prefix='/api/overlays')
     app.register_blueprint(streams_bp, url_prefix='/api/streams')
     app.register_blueprint(settings_bp, url_prefix='/api/settings')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
 
     @app.errorhandler(404)
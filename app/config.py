@@ -13,6 +13,10 @@ class Config:
     HLS_OUTPUT_DIR = './hls_output'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
 
+    # Logging
+    LOG_MAX_BYTES = 10 * 1024 * 1024  # 10MB per log file
+    LOG_BACKUP_COUNT = 5
+
     # CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
 
@@ -21,7 +25,59 @@ class Config:
     UPLOAD_FOLDER = './uploads'
 
     # Stream configuration
-    STREAM_TIMEOUT = 300
+    # Streams without viewers for this many seconds are stopped and restarted on the next playlist request (0 disables)
+    STREAM_TIMEOUT = int(os.environ.get('STREAM_TIMEOUT', 300))
+    # Default for the max_concurrent_streams setting and worker pool size for bulk start/stop
+    MAX_CONCURRENT_STREAMS = 5
+    BULK_STREAM_WORKERS = 8
+    # Skip/shorten probing for known sources, prefer RTSP over TCP and cut a short first segment
+    STREAM_FAST_START = os.environ.get('STREAM_FAST_START', 'false').lower() == 'true'
+
+    # FFmpeg encoder placement (opt-in): core pinning (spread across NUMA nodes), lower CPU/IO
+    # priority and an optional cgroup v2 CPU quota in cores (e.g. 1.5) under ENCODER_CGROUP_ROOT.
+    # Reserved cores are only kept free of encoders; pin the API workers to them separately
+    # (e.g. `taskset -c 0 gunicorn ...`) to fully isolate them
+    ENCODER_PLACEMENT_ENABLED = os.environ.get('ENCODER_PLACEMENT_ENABLED', 'false').lower() == 'true'
+    ENCODER_CORES_PER_STREAM = int(os.environ.get('ENCODER_CORES_PER_STREAM', 2))
+    ENCODER_RESERVED_CORES = int(os.environ.get('ENCODER_RESERVED_CORES', 1))
+    ENCODER_NICE = int(os.environ.get('ENCODER_NICE', 10))
+    ENCODER_IONICE_IDLE = os.environ.get('ENCODER_IONICE_IDLE', 'false').lower() == 'true'
+    ENCODER_CGROUP_ROOT = os.environ.get('ENCODER_CGROUP_ROOT', '/sys/fs/cgroup/livesitter')
+    ENCODER_CGROUP_CPU_QUOTA = float(os.environ['ENCODER_CGROUP_CPU_QUOTA']) if os.environ.get('ENCODER_CGROUP_CPU_QUOTA') else None
+
+    # Motion analytics: low-rate grayscale side output of each stream's FFmpeg, per-stream opt-in
+    ANALYTICS_ENABLED = os.environ.get('ANALYTICS_ENABLED', 'false').lower() == 'true'
+    ANALYTICS_WIDTH = 160
+    ANALYTICS_HEIGHT = 90
+    ANALYTICS_FPS = 2
+    ANALYTICS_BATCH_INTERVAL = 5  # seconds between batched Mongo writes
+    ANALYTICS_PIXEL_THRESHOLD = 25  # gray levels a pixel must change by
+    ANALYTICS_MOTION_THRESHOLD = 0.01  # fraction of changed pixels counting as motion
+    ANALYTICS_COOLDOWN = 3  # seconds without motion ending an event
+    # Motion SSE connections each hold a gunicorn thread (gthread workers); they are closed
+    # periodically and reconnected by the client so threads are recycled
+    SSE_MAX_CONNECTION_SECONDS = 100
+
+    # Multi-node sharding: each node must run a single worker with its own NODE_URL;
+    # a lock file in CLUSTER_LOCK_DIR makes additional workers for the same node fail to start
+    CLUSTER_ENABLED = os.environ.get('CLUSTER_ENABLED', 'false').lower() == 'true'
+    NODE_ID = os.environ.get('NODE_ID')
+    NODE_URL = os.environ.get('NODE_URL', 'http://localhost:5000')
+    CLUSTER_BACKEND = os.environ.get('CLUSTER_BACKEND', 'redis')  # 'redis' or 'file'
+    CLUSTER_DIR = os.environ.get('CLUSTER_DIR', './cluster')
+    CLUSTER_LOCK_DIR = os.environ.get('CLUSTER_LOCK_DIR')
+    CLUSTER_ROUTING = os.environ.get('CLUSTER_ROUTING', 'redirect')  # 'redirect' or 'proxy'
+    CLUSTER_HEARTBEAT_INTERVAL = 2
+    CLUSTER_NODE_TTL = 10
+
+    # Profiling: admin endpoints and per-request profiles require the X-Admin-Token header
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 1000))
+    PROFILE_HISTORY = 20
+    # Profiles, worker samples and slow requests are shared by all workers through REDIS_URL;
+    # with 'memory' each worker keeps its own, so fetch results from the pid that produced them
+    PROFILE_STORE = os.environ.get('PROFILE_STORE', 'redis')  # 'redis' or 'memory'
+    PROFILE_MAX_SAMPLE_SECONDS = 60
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -0,0 +1,54 @@
+from datetime import datetime
+from app import mongo
+
+class MotionEventModel:
+    @staticmethod
+    def insert_events(events):
+        """Insert a batch of motion events"""
+        try:
+            if not events:
+                return 0, None
+            result = mongo.db.motion_events.insert_many(events, ordered=False)
+            return len(result.inserted_ids), None
+        except Exception as e:
+            return 0, str(e)
+
+    @staticmethod
+    def get_events(stream_id, start=None, end=None, limit=100):
+        """Get motion events for a stream, newest first, optionally within a time range"""
+        try:
+            query = {'stream_id': stream_id}
+            if start or end:
+                query['started_at'] = {}
+                if start:
+                    query['started_at']['$gte'] = start
+                if end:
+                    query['started_at']['$lte'] = end
+
+            events = list(mongo.db.motion_events.find(query).sort('started_at', -1).limit(limit))
+            return events, None
+        except Exception as e:
+            return None, str(e)
+
+    @staticmethod
+    def ensure_indexes():
+        """Create the index used by stream/time queries"""
+        try:
+            mongo.db.motion_events.create_index([('stream_id', 1), ('started_at', -1)])
+            return True, None
+        except Exception as e:
+            return False, str(e)
+
+    @staticmethod
+    def serialize_event(event):
+        """Convert MongoDB document to JSON serializable format"""
+        if not event:
+            return None
+
+        event = dict(event)
+        if '_id' in event:
+            event['_id'] = str(event['_id'])
+        for field in ('started_at', 'ended_at'):
+            if isinstance(event.get(field), datetime):
+                event[field] = event[field].isoformat() + 'Z'
+        return event
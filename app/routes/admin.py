@@ -0,0 +1,123 @@
+from flask import Blueprint, request, jsonify, current_app, Response
+from app.utils.profiling import request_profiler, is_admin_request
+import logging
+import time
+
+admin_bp = Blueprint('admin', __name__)
+logger = logging.getLogger(__name__)
+
+@admin_bp.before_request
+def require_admin():
+    """Guard every admin endpoint with the ADMIN_TOKEN"""
+    if not is_admin_request(current_app):
+        return jsonify({'error': 'Admin token required'}), 403
+
+@admin_bp.route('/profile/sample', methods=['POST'])
+def sample_worker():
+    """Start sampling all threads of this worker for a fixed time in the background"""
+    try:
+        max_seconds = current_app.config['PROFILE_MAX_SAMPLE_SECONDS']
+        try:
+            seconds = float(request.args.get('seconds', 10))
+            interval_ms = float(request.args.get('interval_ms', 5))
+        except ValueError:
+            return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+
+        if not 0 < seconds <= max_seconds:
+            return jsonify({'error': f'seconds must be between 0 and {max_seconds}'}), 400
+        if interval_ms < 1:
+            return jsonify({'error': 'interval_ms must be at least 1'}), 400
+
+        sample = request_profiler.start_worker_sample(seconds, interval_ms / 1000)
+        if sample is None:
+            return jsonify({'error': 'A worker sample is already running'}), 409
+
+        logger.info(f"Worker sample {sample['id']} started for {seconds}s")
+        return jsonify({
+            'sample_id': sample['id'],
+            'pid': sample['pid'],
+            'seconds': seconds,
+            'status': 'running'
+        }), 202
+
+    except Exception as e:
+        logger.error(f'Unexpected error in sample_worker: {str(e)}')
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+@admin_bp.route('/profile/sample/<sample_id>', methods=['GET'])
+def get_worker_sample(sample_id):
+    """Get a finished worker sample as collapsed stacks, or its progress while running"""
+    try:
+        record = request_profiler.store.get('sample', sample_id)
+
+        if not record:
+            return jsonify({'error': 'Sample not found'}), 404
+
+        if record['status'] != 'done':
+            return jsonify({
+                'sample_id': sample_id,
+                'pid': record['pid'],
+                'seconds': record['seconds'],
+                'elapsed': round(time.time() - record['started_at'], 1),
+                'status': record['status']
+            }), 202 if record['status'] == 'running' else 500
+
+        # Collapsed stack format, ready for flamegraph.pl or speedscope
+        return Response(record['collapsed'], mimetype='text/plain', headers={'X-Profile-Pid': str(record['pid'])})
+
+    except Exception as e:
+        logger.error(f'Unexpected error in get_worker_sample: {str(e)}')
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+@admin_bp.route('/profile/requests', methods=['GET'])
+def get_request_profiles():
+    """List recent single-request profiles"""
+    try:
+        profiles = [{key: value for key, value in record.items() if key != 'collapsed'}
+                    for record in request_profiler.store.get_recent('request')]
+        return jsonify({
+            'profiles': profiles,
+            'count': len(profiles),
+            'status': 'success'
+        }), 200
+
+    except Exception as e:
+        logger.error(f'Unexpected error in get_request_profiles: {str(e)}')
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+@admin_bp.route('/profile/requests/<profile_id>', methods=['GET'])
+def get_request_profile(profile_id):
+    """Get a single-request profile, as JSON or collapsed stacks (?format=collapsed)"""
+    try:
+        record = request_profiler.store.get('request', profile_id)
+
+        if not record:
+            return jsonify({'error': 'Profile not found'}), 404
+
+        if request.args.get('format') == 'collapsed':
+            return Response(record['collapsed'], mimetype='text/plain')
+
+        return jsonify({
+            'profile': record,
+            'status': 'success'
+        }), 200
+
+    except Exception as e:
+        logger.error(f'Unexpected error in get_request_profile: {str(e)}')
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+@admin_bp.route('/profile/slow', methods=['GET'])
+def get_slow_requests():
+    """List recent requests slower than SLOW_REQUEST_THRESHOLD_MS"""
+    try:
+        slow_requests = request_profiler.store.list_slow()
+        return jsonify({
+            'slow_requests': slow_requests,
+            'threshold_ms': request_profiler.slow_threshold,
+            'count': len(slow_requests),
+            'status': 'success'
+        }), 200
+
+    except Exception as e:
+        logger.error(f'Unexpected error in get_slow_requests: {str(e)}')
+        return jsonify({'error': 'An unexpected error occurred'}), 500
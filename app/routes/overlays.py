@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from app.models.overlay import OverlayModel
+from app.utils.profiling import timed_stage
 from bson import ObjectId
 import logging
 
@@ -56,7 +57,8 @@ def get_overlays():
             return jsonify({'error': error}), 500
 
         # Serialize overlays
-        serialized_overlays = [OverlayModel.serialize_overlay(overlay) for overlay in overlays]
+        with timed_stage('serialization'):
+            serialized_overlays = [OverlayModel.serialize_overlay(overlay) for overlay in overlays]
 
         return jsonify({
             'overlays': serialized_overlays,
@@ -1,8 +1,16 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, current_app, redirect, Response, stream_with_context
 from app.services.stream_service import StreamService
+from app.services.cluster_service import ClusterService
+from app.services.encoder_placement import EncoderPlacement
+from app.models.motion_event import MotionEventModel
+from app import mongo
 import os
 import logging
 import time
+import requests
+import json
+import queue
+from datetime import datetime, timezone
 from urllib.parse import urlparse
 
 streams_bp = Blueprint('streams', __name__)
@@ -12,6 +20,105 @@ logger = logging.getLogger(__name__)
 # Go up two directories from this file (/app/routes/streams.py -> /app/routes -> /app) then add hls_output
 HLS_OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'hls_output'))
 stream_service = StreamService(HLS_OUTPUT_DIR)
+cluster_service = ClusterService(stream_service)
+
+# Marks requests already routed by another node so they are never bounced again
+FORWARDED_HEADER = 'X-LiveSitter-Forwarded'
+# Connection-level headers that must not be copied by a proxy (RFC 7230 section 6.1)
+HOP_BY_HOP_HEADERS = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+                      'te', 'trailers', 'transfer-encoding', 'upgrade'}
+
+@streams_bp.record_once
+def _init_cluster(state):
+    cluster_service.init_app(state.app)
+
+@streams_bp.record_once
+def _init_encoder_placement(state):
+    config = state.app.config
+    stream_service.placement = EncoderPlacement(
+        enabled=config.get('ENCODER_PLACEMENT_ENABLED', False),
+        cores_per_stream=config.get('ENCODER_CORES_PER_STREAM', 2),
+        reserved_cores=config.get('ENCODER_RESERVED_CORES', 1),
+        nice=config.get('ENCODER_NICE', 10),
+        ionice_idle=config.get('ENCODER_IONICE_IDLE', False),
+        cgroup_root=config.get('ENCODER_CGROUP_ROOT'),
+        cgroup_cpu_quota=config.get('ENCODER_CGROUP_CPU_QUOTA')
+    )
+
+@streams_bp.record_once
+def _init_motion_analytics(state):
+    config = state.app.config
+    stream_service.motion.configure(
+        width=config.get('ANALYTICS_WIDTH', 160),
+        height=config.get('ANALYTICS_HEIGHT', 90),
+        fps=config.get('ANALYTICS_FPS', 2),
+        batch_interval=config.get('ANALYTICS_BATCH_INTERVAL', 5),
+        pixel_threshold=config.get('ANALYTICS_PIXEL_THRESHOLD', 25),
+        motion_threshold=config.get('ANALYTICS_MOTION_THRESHOLD', 0.01),
+        cooldown=config.get('ANALYTICS_COOLDOWN', 3)
+    )
+
+@streams_bp.record_once
+def _init_idle_reaper(state):
+    stream_service.start_idle_reaper(state.app.config.get('STREAM_TIMEOUT'))
+
+def _route_to_owner(stream_id):
+    """Redirect or proxy a request to the node owning the stream, if that is not this node"""
+    if request.headers.get(FORWARDED_HEADER) or cluster_service.is_local(stream_id):
+        return None
+
+    node_id, node_url = cluster_service.get_owner(stream_id)
+    if not node_url:
+        return None
+
+    target = node_url + request.path
+    if request.query_string:
+        target += '?' + request.query_string.decode()
+
+    if cluster_service.routing != 'proxy':
+        # 307 keeps the method and body, so POSTs are replayed against the owner
+        return redirect(target, code=307)
+
+    headers = {key: value for key, value in request.headers
+               if key.lower() not in HOP_BY_HOP_HEADERS | {'host', 'content-length'}}
+    headers[FORWARDED_HEADER] = cluster_service.node_id
+    upstream = requests.request(request.method, target, headers=headers, data=request.get_data(),
+                                stream=True, timeout=30)
+    # Pass the body through undecoded so Content-Encoding and Content-Length stay valid
+    response = Response(upstream.raw.stream(65536, decode_content=False), status=upstream.status_code,
+                        headers=[(key, value) for key, value in upstream.headers.items()
+                                 if key.lower() not in HOP_BY_HOP_HEADERS])
+    response.call_on_close(upstream.close)
+    return response
+
+def _validate_source_url(rtsp_url):
+    """Validate RTSP URL or file path format, returning an error message or None"""
+    try:
+        parsed_url = urlparse(rtsp_url)
+        # Allow file:// or absolute paths for local testing
+        if parsed_url.scheme not in ['rtsp', 'file', ''] and not rtsp_url.startswith('/'):
+            return 'Invalid URL scheme. Must start with rtsp:// or file:// (or use absolute path for local files)'
+    except Exception:
+        return 'Invalid URL format'
+    return None
+
+def _parse_timestamp(value):
+    """Parse an optional ISO 8601 timestamp into a naive UTC datetime"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _get_stream_capacity():
+    """Get the max_concurrent_streams setting, falling back to the default"""
+    try:
+        settings = mongo.db.settings.find_one({'type': 'app_settings'}) or {}
+        return settings.get('max_concurrent_streams', current_app.config['MAX_CONCURRENT_STREAMS'])
+    except Exception as e:
+        logger.error(f'Error fetching stream capacity setting: {str(e)}')
+        return current_app.config['MAX_CONCURRENT_STREAMS']
 
 @streams_bp.route('/start', methods=['POST'])
 def start_stream():
@@ -24,44 +131,49 @@ def start_stream():
 
         rtsp_url = data.get('rtsp_url')
         stream_id = data.get('stream_id', 'default')
+        fast_start = bool(data.get('fast_start', current_app.config.get('STREAM_FAST_START', False)))
+        analytics = bool(data.get('analytics', current_app.config.get('ANALYTICS_ENABLED', False)))
 
         if not rtsp_url:
             return jsonify({'error': 'RTSP URL is required'}), 400
 
         # Validate RTSP URL or file path format
-        try:
-            parsed_url = urlparse(rtsp_url)
-            # Allow file:// or absolute paths for local testing
-            if parsed_url.scheme not in ['rtsp', 'file', ''] and not rtsp_url.startswith('/'):
-                return jsonify({'error': 'Invalid URL scheme. Must start with rtsp:// or file:// (or use absolute path for local files)'}), 400
-        except Exception:
-            return jsonify({'error': 'Invalid URL format'}), 400
-
-        # Start the stream
-        success = stream_service.start_stream(rtsp_url, stream_id)
+        url_error = _validate_source_url(rtsp_url)
+        if url_error:
+            return jsonify({'error': url_error}), 400
+
+        # Record the definition so whichever node owns the stream can (re)start it
+        cluster_service.register_stream(stream_id, {'rtsp_url': rtsp_url, 'fast_start': fast_start,
+                                                    'analytics': analytics})
+        routed = _route_to_owner(stream_id)
+        if routed:
+            return routed
+
+        # Start the stream; the owner may already have started it from the registration above
+        # (e.g. a replayed 307), so an identical running encoder is kept rather than restarted
+        success = stream_service.start_stream(rtsp_url, stream_id, fast_start=fast_start, analytics=analytics,
+                                              reuse_running=cluster_service.enabled)
 
         if not success:
             return jsonify({'error': 'Failed to start stream. Please check the RTSP URL and try again.'}), 500
 
-        # Wait for FFmpeg to create initial segments (2-3 seconds)
+        # Wait for FFmpeg to create initial segments (2-3 seconds, well under 1s in fast-start mode)
         # This prevents the frontend from trying to load the playlist before it exists
-        playlist_path = os.path.join(HLS_OUTPUT_DIR, stream_id, 'playlist.m3u8')
         max_wait = 5  # Maximum 5 seconds wait
-        waited = 0
-        while not os.path.exists(playlist_path) and waited < max_wait:
-            time.sleep(0.5)
-            waited += 0.5
-
-        if not os.path.exists(playlist_path):
+        if not stream_service.wait_for_playlist(stream_id, max_wait):
             logger.warning(f'Playlist not ready after {max_wait}s for stream {stream_id}')
 
         playlist_url = stream_service.get_hls_playlist_url(stream_id)
+        stream_info = stream_service.get_stream_info(stream_id)
 
         logger.info(f'Stream started: {stream_id} from {rtsp_url}')
         return jsonify({
             'message': 'Stream started successfully',
             'playlist_url': playlist_url,
             'stream_id': stream_id,
+            'fast_start': fast_start,
+            'analytics': analytics,
+            'time_to_first_playlist': stream_info['time_to_first_playlist'] if stream_info else None,
             'status': 'success'
         }), 200
 
@@ -76,6 +188,11 @@ def stop_stream():
         data = request.get_json()
         stream_id = data.get('stream_id', 'default')
 
+        cluster_service.unregister_stream(stream_id)
+        routed = _route_to_owner(stream_id)
+        if routed:
+            return routed
+
         success = stream_service.stop_stream(stream_id)
 
         if not success:
@@ -91,6 +208,131 @@ def stop_stream():
         logger.error(f'Unexpected error in stop_stream: {str(e)}')
         return jsonify({'error': 'An unexpected error occurred while stopping the stream'}), 500
 
+@streams_bp.route('/bulk/start', methods=['POST'])
+def bulk_start_streams():
+    """Start several streams concurrently"""
+    try:
+        data = request.get_json()
+
+        if not data or not isinstance(data.get('streams'), list):
+            return jsonify({'error': 'A list of streams is required'}), 400
+
+        default_fast_start = current_app.config.get('STREAM_FAST_START', False)
+        default_analytics = current_app.config.get('ANALYTICS_ENABLED', False)
+        results = []
+        local_definitions = []
+        local_indices = []
+        seen = set()
+        for entry in data['streams']:
+            stream_id = entry.get('stream_id') if isinstance(entry, dict) else None
+            rtsp_url = entry.get('rtsp_url') if isinstance(entry, dict) else None
+            if not stream_id or not rtsp_url:
+                results.append({'stream_id': stream_id, 'status': 'invalid', 'error': 'stream_id and rtsp_url are required'})
+                continue
+            if not isinstance(stream_id, str) or not isinstance(rtsp_url, str):
+                results.append({'stream_id': stream_id, 'status': 'invalid', 'error': 'stream_id and rtsp_url must be strings'})
+                continue
+            if stream_id in seen:
+                results.append({'stream_id': stream_id, 'status': 'invalid', 'error': 'Duplicate stream_id'})
+                continue
+            seen.add(stream_id)
+            url_error = _validate_source_url(rtsp_url)
+            if url_error:
+                results.append({'stream_id': stream_id, 'status': 'invalid', 'error': url_error})
+                continue
+
+            definition = {'stream_id': stream_id, 'rtsp_url': rtsp_url,
+                          'fast_start': bool(entry.get('fast_start', default_fast_start)),
+                          'analytics': bool(entry.get('analytics', default_analytics))}
+            cluster_service.register_stream(stream_id, {'rtsp_url': rtsp_url, 'fast_start': definition['fast_start'],
+                                                        'analytics': definition['analytics']})
+            if not cluster_service.is_local(stream_id):
+                # The owning node picks the stream up on its next membership sync
+                owner_id, _ = cluster_service.get_owner(stream_id)
+                results.append({'stream_id': stream_id, 'status': 'assigned', 'node_id': owner_id})
+                continue
+
+            # Placeholder, filled in with the start result below
+            local_indices.append(len(results))
+            results.append(None)
+            local_definitions.append(definition)
+
+        started = stream_service.start_streams(
+            local_definitions,
+            max_workers=current_app.config['BULK_STREAM_WORKERS'],
+            capacity=_get_stream_capacity()
+        )
+        for index, result in zip(local_indices, started):
+            results[index] = result
+
+        succeeded = sum(1 for result in results if result['status'] in ('started', 'assigned'))
+        logger.info(f'Bulk start: {succeeded}/{len(results)} streams started')
+        return jsonify({
+            'results': results,
+            'started': succeeded,
+            'failed': len(results) - succeeded,
+            'status': 'success'
+        }), 200
+
+    except Exception as e:
+        logger.error(f'Unexpected error in bulk_start_streams: {str(e)}')
+        return jsonify({'error': 'An unexpected error occurred while starting streams'}), 500
+
+@streams_bp.route('/bulk/stop', methods=['POST'])
+def bulk_stop_streams():
+    """Stop several streams concurrently, or all streams with {"all": true}"""
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'No JSON data provided'}), 400
+
+        if data.get('all'):
+            # Include streams stopped while idle so they are not restarted by the next viewer
+            stream_ids = list(dict.fromkeys([*stream_service.active_streams, *stream_service.stream_definitions]))
+        elif isinstance(data.get('stream_ids'), list):
+            stream_ids = data['stream_ids']
+        else:
+            return jsonify({'error': 'A list of stream_ids or "all": true is required'}), 400
+
+        results = []
+        local_ids = []
+        local_indices = []
+        seen = set()
+        for stream_id in stream_ids:
+            if not isinstance(stream_id, str) or not stream_id:
+                results.append({'stream_id': stream_id, 'status': 'invalid', 'error': 'stream_id must be a non-empty string'})
+                continue
+            if stream_id in seen:
+                results.append({'stream_id': stream_id, 'status': 'invalid', 'error': 'Duplicate stream_id'})
+                continue
+            seen.add(stream_id)
+
+            cluster_service.unregister_stream(stream_id)
+            if cluster_service.is_local(stream_id):
+                # Placeholder, filled in with the stop result below
+                local_indices.append(len(results))
+                results.append(None)
+                local_ids.append(stream_id)
+            else:
+                # The owning node stops the stream on its next membership sync
+                owner_id, _ = cluster_service.get_owner(stream_id)
+                results.append({'stream_id': stream_id, 'status': 'released', 'node_id': owner_id})
+
+        stopped = stream_service.stop_streams(local_ids, max_workers=current_app.config['BULK_STREAM_WORKERS'])
+        for index, result in zip(local_indices, stopped):
+            results[index] = result
+
+        logger.info(f'Bulk stop: {len(stream_ids)} streams requested')
+        return jsonify({
+            'results': results,
+            'status': 'success'
+        }), 200
+
+    except Exception as e:
+        logger.error(f'Unexpected error in bulk_stop_streams: {str(e)}')
+        return jsonify({'error': 'An unexpected error occurred while stopping streams'}), 500
+
 @streams_bp.route('/status', methods=['GET'])
 def get_stream_status():
     """Get status of all streams"""
@@ -100,6 +342,7 @@ def get_stream_status():
         return jsonify({
             'active_streams': active_streams,
             'total_streams': len(active_streams),
+            'node_id': cluster_service.node_id,
             'status': 'success'
         }), 200
 
@@ -107,10 +350,146 @@ def get_stream_status():
         logger.error(f'Unexpected error in get_stream_status: {str(e)}')
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
+@streams_bp.route('/cluster', methods=['GET'])
+def get_cluster_status():
+    """Get cluster membership and stream ownership as seen by this node"""
+    try:
+        return jsonify({
+            'cluster': cluster_service.get_cluster_info(),
+            'status': 'success'
+        }), 200
+
+    except Exception as e:
+        logger.error(f'Unexpected error in get_cluster_status: {str(e)}')
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+@streams_bp.route('/<stream_id>/clip.mp4', methods=['GET'])
+def export_clip(stream_id):
+    """Export the last N seconds of a stream as MP4 (?seconds=30), remuxed without re-encoding"""
+    try:
+        routed = _route_to_owner(stream_id)
+        if routed:
+            return routed
+
+        max_seconds = StreamService.HLS_RETAINED_SEGMENTS * StreamService.HLS_SEGMENT_SECONDS
+        seconds = request.args.get('seconds', 30, type=float)
+        if not 0 < seconds <= max_seconds:
+            return jsonify({'error': f'seconds must be between 0 and {max_seconds}'}), 400
+
+        export, error = stream_service.export_clip(stream_id, seconds)
+        if error:
+            return jsonify({'error': f'Clip export failed: {error}'}), 500
+        if not export:
+            return jsonify({'error': 'No segments available for this stream'}), 404
+
+        body, duration, cleanup = export
+        filename = f'{stream_id}_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.mp4'
+        response = Response(body, mimetype='video/mp4', headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Clip-Duration': str(duration)
+        })
+        # A body that is never iterated (HEAD, early disconnect) never runs the generator's cleanup
+        response.call_on_close(cleanup)
+        return response
+
+    except Exception as e:
+        logger.error(f'Error exporting clip for {stream_id}: {str(e)}')
+        return jsonify({'error': 'Error exporting clip'}), 500
+
+@streams_bp.route('/<stream_id>/motion', methods=['GET'])
+def get_motion_events(stream_id):
+    """Get motion events for a stream (?start=&end= ISO timestamps, ?limit=)"""
+    try:
+        try:
+            start = _parse_timestamp(request.args.get('start'))
+            end = _parse_timestamp(request.args.get('end'))
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO 8601 timestamps'}), 400
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+
+        events, error = MotionEventModel.get_events(stream_id, start, end, limit)
+
+        if error:
+            logger.error(f'Error fetching motion events: {error}')
+            return jsonify({'error': error}), 500
+
+        serialized_events = [MotionEventModel.serialize_event(event) for event in events]
+
+        return jsonify({
+            'stream_id': stream_id,
+            'events': serialized_events,
+            'count': len(serialized_events),
+            'status': 'success'
+        }), 200
+
+    except Exception as e:
+        logger.error(f'Unexpected error in get_motion_events: {str(e)}')
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+@streams_bp.route('/<stream_id>/motion/events', methods=['GET'])
+def stream_motion_events(stream_id):
+    """Push motion events for a stream to the client as Server-Sent Events"""
+    routed = _route_to_owner(stream_id)
+    if routed:
+        return routed
+
+    subscriber = stream_service.motion.subscribe(stream_id)
+    # Holds a worker thread while open, so close periodically; EventSource reconnects on its own
+    deadline = time.monotonic() + current_app.config['SSE_MAX_CONNECTION_SECONDS']
+
+    def _events():
+        try:
+            yield 'retry: 1000\n\n'
+            while time.monotonic() < deadline:
+                try:
+                    event = subscriber.get(timeout=max(0.1, min(15, deadline - time.monotonic())))
+                except queue.Empty:
+                    # Keep-alive comment so proxies do not close an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'event: motion\ndata: {json.dumps(event)}\n\n'
+        finally:
+            stream_service.motion.unsubscribe(stream_id, subscriber)
+
+    return Response(stream_with_context(_events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@streams_bp.route('/<stream_id>/logs', methods=['GET'])
+def get_stream_logs(stream_id):
+    """Get recent FFmpeg output for a stream"""
+    try:
+        routed = _route_to_owner(stream_id)
+        if routed:
+            return routed
+
+        limit = request.args.get('limit', type=int)
+        logs = stream_service.get_stream_logs(stream_id, limit)
+
+        if logs is None:
+            return jsonify({'error': 'No logs for this stream'}), 404
+
+        return jsonify({
+            'stream_id': stream_id,
+            **logs,
+            'status': 'success'
+        }), 200
+
+    except Exception as e:
+        logger.error(f'Unexpected error in get_stream_logs: {str(e)}')
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
 @streams_bp.route('/<stream_id>/playlist.m3u8')
 def get_playlist(stream_id):
     """Serve HLS playlist"""
     try:
+        routed = _route_to_owner(stream_id)
+        if routed:
+            return routed
+
+        # Transparently restart a known stream that was stopped for being idle
+        stream_service.ensure_stream(stream_id)
+        stream_service.record_access(stream_id)
+
         # Try to get stream info from active streams
         stream_info = stream_service.get_stream_info(stream_id)
 
@@ -136,6 +515,12 @@ def get_playlist(stream_id):
 def get_segment(stream_id, segment):
     """Serve HLS segment"""
     try:
+        routed = _route_to_owner(stream_id)
+        if routed:
+            return routed
+
+        stream_service.record_access(stream_id)
+
         # Try to get stream info from active streams
         stream_info = stream_service.get_stream_info(stream_id)
 
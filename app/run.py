@@ -4,4 +4,6 @@ import os
 # Development server
 if __name__ == '__main__':
     app = create_app('development')
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # PORT allows several local nodes when CLUSTER_ENABLED; the reloader would spawn duplicate nodes
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=True,
+            use_reloader=not app.config['CLUSTER_ENABLED'])
@@ -0,0 +1,279 @@
+import atexit
+import bisect
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import redis
+
+logger = logging.getLogger(__name__)
+
+class HashRing:
+    """Consistent hash ring mapping stream IDs to node IDs"""
+
+    def __init__(self, nodes=None, replicas=100):
+        self.replicas = replicas
+        self._keys = []
+        self._ring = {}
+        for node in nodes or []:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16)
+
+    def add_node(self, node):
+        """Add a node with its virtual replicas to the ring"""
+        for i in range(self.replicas):
+            key = self._hash(f'{node}#{i}')
+            self._ring[key] = node
+            bisect.insort(self._keys, key)
+
+    def get_node(self, stream_id):
+        """Get the node owning a stream ID"""
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, self._hash(stream_id)) % len(self._keys)
+        return self._ring[self._keys[index]]
+
+class FileMembership:
+    """File-based membership store for running several nodes on one machine"""
+
+    def __init__(self, base_dir, node_ttl):
+        self.nodes_dir = os.path.join(base_dir, 'nodes')
+        self.streams_dir = os.path.join(base_dir, 'streams')
+        self.node_ttl = node_ttl
+        os.makedirs(self.nodes_dir, exist_ok=True)
+        os.makedirs(self.streams_dir, exist_ok=True)
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_dir(path):
+        entries = {}
+        for name in os.listdir(path):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(path, name)) as f:
+                    entries[name[:-len('.json')]] = json.load(f)
+            except (OSError, ValueError):
+                # Partially written or concurrently removed entry
+                continue
+        return entries
+
+    def heartbeat(self, node_id, node_url):
+        self._write_json(os.path.join(self.nodes_dir, f'{node_id}.json'),
+                         {'url': node_url, 'heartbeat': time.time()})
+
+    def leave(self, node_id):
+        try:
+            os.remove(os.path.join(self.nodes_dir, f'{node_id}.json'))
+        except FileNotFoundError:
+            pass
+
+    def get_nodes(self):
+        now = time.time()
+        return {node_id: data['url'] for node_id, data in self._read_dir(self.nodes_dir).items()
+                if now - data.get('heartbeat', 0) < self.node_ttl}
+
+    def register_stream(self, stream_id, definition):
+        self._write_json(os.path.join(self.streams_dir, f'{stream_id}.json'), definition)
+
+    def unregister_stream(self, stream_id):
+        try:
+            os.remove(os.path.join(self.streams_dir, f'{stream_id}.json'))
+        except FileNotFoundError:
+            pass
+
+    def get_streams(self):
+        return self._read_dir(self.streams_dir)
+
+class RedisMembership:
+    """Redis-backed membership store; node entries expire unless refreshed"""
+
+    NODE_PREFIX = 'livesitter:nodes:'
+    STREAMS_KEY = 'livesitter:streams'
+
+    def __init__(self, redis_url, node_ttl):
+        self.client = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.node_ttl = node_ttl
+
+    def heartbeat(self, node_id, node_url):
+        self.client.set(f'{self.NODE_PREFIX}{node_id}', node_url, ex=max(1, int(self.node_ttl)))
+
+    def leave(self, node_id):
+        self.client.delete(f'{self.NODE_PREFIX}{node_id}')
+
+    def get_nodes(self):
+        nodes = {}
+        for key in self.client.scan_iter(match=f'{self.NODE_PREFIX}*'):
+            url = self.client.get(key)
+            if url:
+                nodes[key[len(self.NODE_PREFIX):]] = url
+        return nodes
+
+    def register_stream(self, stream_id, definition):
+        self.client.hset(self.STREAMS_KEY, stream_id, json.dumps(definition))
+
+    def unregister_stream(self, stream_id):
+        self.client.hdel(self.STREAMS_KEY, stream_id)
+
+    def get_streams(self):
+        return {stream_id: json.loads(definition)
+                for stream_id, definition in self.client.hgetall(self.STREAMS_KEY).items()}
+
+class ClusterService:
+    """Shard streams across backend nodes by consistent hashing of stream IDs"""
+
+    def __init__(self, stream_service):
+        self.stream_service = stream_service
+        self.enabled = False
+        self.node_id = None
+        self.node_url = None
+        self.routing = 'redirect'
+        self.membership = None
+        self.ring = HashRing()
+        self.nodes = {}
+        self._owned = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._node_lock_file = None
+
+    def _acquire_node_lock(self, lock_dir):
+        """Ensure only one process acts as this node
+
+        Every worker process has its own StreamService, so several workers
+        sharing a node_id would each take over every owned stream.
+        """
+        lock_path = os.path.join(lock_dir, f'livesitter-node-{self.node_id}.lock')
+        lock_file = open(lock_path, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(f'Cluster node {self.node_id} is already running in another process; '
+                               'run a single worker per node when CLUSTER_ENABLED is set')
+        # Held open for the life of the process
+        self._node_lock_file = lock_file
+
+    def init_app(self, app):
+        """Configure clustering from the app config and start the heartbeat"""
+        self.enabled = app.config.get('CLUSTER_ENABLED', False)
+        if not self.enabled or self._thread:
+            return
+
+        self.node_url = app.config['NODE_URL'].rstrip('/')
+        self.node_id = app.config.get('NODE_ID') or f'{socket.gethostname()}-{self.node_url.rsplit(":", 1)[-1]}'
+        self.routing = app.config.get('CLUSTER_ROUTING', 'redirect')
+        self.heartbeat_interval = app.config.get('CLUSTER_HEARTBEAT_INTERVAL', 2)
+        node_ttl = app.config.get('CLUSTER_NODE_TTL', 10)
+        self._acquire_node_lock(app.config.get('CLUSTER_LOCK_DIR') or tempfile.gettempdir())
+
+        if app.config.get('CLUSTER_BACKEND', 'redis') == 'file':
+            self.membership = FileMembership(app.config['CLUSTER_DIR'], node_ttl)
+        else:
+            self.membership = RedisMembership(app.config['REDIS_URL'], node_ttl)
+
+        self.sync()
+        self._thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._thread.start()
+        atexit.register(self.leave)
+        logger.info(f'Cluster node {self.node_id} joined at {self.node_url}')
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            self.sync()
+
+    def sync(self):
+        """Refresh membership, rebuild the ring and rebalance local streams"""
+        with self._lock:
+            # Read under the lock so a concurrent register_stream is never lost
+            try:
+                self.membership.heartbeat(self.node_id, self.node_url)
+                nodes = self.membership.get_nodes()
+                nodes[self.node_id] = self.node_url
+                streams = self.membership.get_streams()
+            except Exception as e:
+                logger.error(f'Cluster membership sync failed: {str(e)}')
+                return
+
+            if nodes != self.nodes:
+                logger.info(f'Cluster membership changed: {sorted(nodes)}')
+                self.nodes = nodes
+                self.ring = HashRing(sorted(nodes))
+
+            owned = {stream_id for stream_id in streams if self.ring.get_node(stream_id) == self.node_id}
+            newly_owned = owned - self._owned
+            self._owned = owned
+
+        # Hand off streams that now belong to another node, or were stopped elsewhere
+        for stream_id in list(self.stream_service.active_streams.keys()):
+            if stream_id not in self._owned:
+                logger.info(f'Releasing stream {stream_id} to node {self.ring.get_node(stream_id)}')
+                self.stream_service.stop_stream(stream_id)
+
+        # Take over streams assigned to this node since the last sync
+        for stream_id in newly_owned:
+            if stream_id in self.stream_service.active_streams:
+                continue
+            definition = streams[stream_id]
+            logger.info(f'Taking over stream {stream_id}')
+            self.stream_service.start_stream(definition['rtsp_url'], stream_id,
+                                             fast_start=definition.get('fast_start', False),
+                                             analytics=definition.get('analytics', False))
+
+    def leave(self):
+        """Remove this node from the cluster so its streams are rebalanced"""
+        if self.enabled and self.membership:
+            self.membership.leave(self.node_id)
+
+    def get_owner(self, stream_id):
+        """Get (node_id, node_url) of the node owning a stream"""
+        with self._lock:
+            node_id = self.ring.get_node(stream_id)
+            return node_id, self.nodes.get(node_id)
+
+    def is_local(self, stream_id):
+        """Whether this node should serve the stream"""
+        if not self.enabled:
+            return True
+        node_id, _ = self.get_owner(stream_id)
+        return node_id is None or node_id == self.node_id
+
+    def register_stream(self, stream_id, definition):
+        """Record a stream definition so its owner can (re)start it"""
+        if self.enabled:
+            with self._lock:
+                self.membership.register_stream(stream_id, definition)
+                if self.ring.get_node(stream_id) == self.node_id:
+                    self._owned.add(stream_id)
+
+    def unregister_stream(self, stream_id):
+        """Remove a stream definition from the cluster"""
+        if self.enabled:
+            with self._lock:
+                self.membership.unregister_stream(stream_id)
+                self._owned.discard(stream_id)
+
+    def get_cluster_info(self):
+        """Get membership and stream ownership for this node's view of the cluster"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'node_id': self.node_id,
+                'node_url': self.node_url,
+                'nodes': dict(self.nodes),
+                'owned_streams': sorted(self._owned)
+            }
@@ -0,0 +1,159 @@
+import glob
+import logging
+import os
+import shutil
+import threading
+import psutil
+
+logger = logging.getLogger(__name__)
+
+class EncoderPlacement:
+    """Decide CPU affinity, priority and cgroup quota for FFmpeg encoders
+
+    Encoders are spread over the cores left after reserving some for the API
+    workers, filling NUMA nodes evenly, and run at a lower CPU/IO priority so
+    request latency does not suffer when encoders are busy.
+    """
+
+    def __init__(self, enabled=False, cores_per_stream=2, reserved_cores=1, nice=10,
+                 ionice_idle=False, cgroup_root=None, cgroup_cpu_quota=None):
+        self.enabled = enabled
+        self.cores_per_stream = cores_per_stream
+        self.nice = nice
+        self.ionice_idle = ionice_idle
+        self.cgroup_root = cgroup_root
+        self.cgroup_cpu_quota = cgroup_cpu_quota
+        self.numa_nodes = self._discover_numa_nodes(reserved_cores)
+        self.assignments = {}
+        self._lock = threading.Lock()
+        self._tools = {tool: shutil.which(tool) for tool in ('taskset', 'nice', 'ionice')}
+
+    @staticmethod
+    def _parse_cpulist(cpulist):
+        cpus = set()
+        for part in cpulist.strip().split(','):
+            if '-' in part:
+                start, end = part.split('-')
+                cpus.update(range(int(start), int(end) + 1))
+            elif part:
+                cpus.add(int(part))
+        return cpus
+
+    def _discover_numa_nodes(self, reserved_cores):
+        """Map NUMA node -> usable CPUs, leaving the lowest CPUs to the API workers"""
+        try:
+            allowed = sorted(os.sched_getaffinity(0))
+        except AttributeError:
+            allowed = list(range(psutil.cpu_count() or 1))
+
+        usable = set(allowed[reserved_cores:]) or set(allowed)
+
+        nodes = {}
+        for path in glob.glob('/sys/devices/system/node/node[0-9]*/cpulist'):
+            node = int(os.path.basename(os.path.dirname(path))[len('node'):])
+            try:
+                with open(path) as f:
+                    cpus = self._parse_cpulist(f.read()) & usable
+            except OSError:
+                continue
+            if cpus:
+                nodes[node] = sorted(cpus)
+        return nodes or {0: sorted(usable)}
+
+    def assign(self, stream_id):
+        """Pick the least loaded core set for a new encoder"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            load = {}
+            for placement in self.assignments.values():
+                for cpu in placement['cpus']:
+                    load[cpu] = load.get(cpu, 0) + 1
+
+            def _node_load(node):
+                return sum(load.get(cpu, 0) for cpu in self.numa_nodes[node]) / len(self.numa_nodes[node])
+
+            node = min(self.numa_nodes, key=_node_load)
+            cpus = sorted(self.numa_nodes[node], key=lambda cpu: (load.get(cpu, 0), cpu))
+            placement = {
+                'numa_node': node,
+                'cpus': sorted(cpus[:self.cores_per_stream]),
+                'nice': self.nice,
+                'ionice': 'idle' if self.ionice_idle else 'best-effort-7',
+                'cgroup': None
+            }
+            self.assignments[stream_id] = placement
+            return placement
+
+    def release(self, stream_id):
+        """Forget a stream's placement and remove its cgroup"""
+        with self._lock:
+            placement = self.assignments.pop(stream_id, None)
+        if placement and placement['cgroup']:
+            try:
+                os.rmdir(placement['cgroup'])
+            except OSError as e:
+                logger.warning(f"Could not remove cgroup {placement['cgroup']}: {str(e)}")
+
+    def wrap_command(self, command, placement):
+        """Prefix the FFmpeg command with taskset/nice/ionice where available
+
+        The tools set affinity and priority before exec'ing FFmpeg, so every
+        FFmpeg thread inherits them; doing this in a preexec_fn is unsafe in a
+        threaded server. Settings whose tool is missing are applied after spawn.
+        """
+        if not placement:
+            return command, set()
+
+        prefix = []
+        applied = set()
+        if self._tools.get('taskset'):
+            prefix += [self._tools['taskset'], '-c', ','.join(str(cpu) for cpu in placement['cpus'])]
+            applied.add('cpus')
+        if self._tools.get('nice'):
+            prefix += [self._tools['nice'], '-n', str(placement['nice'])]
+            applied.add('nice')
+        if self._tools.get('ionice'):
+            prefix += [self._tools['ionice']] + (['-c', '3'] if self.ionice_idle else ['-c', '2', '-n', '7'])
+            applied.add('ionice')
+        return prefix + command, applied
+
+    def apply_after_spawn(self, pid, placement, applied):
+        """Apply with psutil whatever wrap_command could not (affects the main thread only)"""
+        if not placement:
+            return
+        try:
+            process = psutil.Process(pid)
+            if 'cpus' not in applied and hasattr(process, 'cpu_affinity'):
+                process.cpu_affinity(placement['cpus'])
+            if 'nice' not in applied:
+                process.nice(placement['nice'])
+            if 'ionice' not in applied:
+                if self.ionice_idle:
+                    process.ionice(psutil.IOPRIO_CLASS_IDLE)
+                else:
+                    process.ionice(psutil.IOPRIO_CLASS_BE, value=7)
+        except (AttributeError, OSError, psutil.Error) as e:
+            logger.warning(f'Could not apply encoder placement to pid {pid}: {str(e)}')
+
+    def apply_cgroup(self, stream_id, pid):
+        """Move an encoder into its own cgroup v2 with a CPU quota, if configured"""
+        placement = self.assignments.get(stream_id)
+        if not placement or not self.cgroup_root or not self.cgroup_cpu_quota:
+            return
+        cgroup_path = os.path.join(self.cgroup_root, stream_id)
+        try:
+            os.makedirs(self.cgroup_root, exist_ok=True)
+            # cpu.max only exists in children once the root delegates the cpu controller
+            with open(os.path.join(self.cgroup_root, 'cgroup.subtree_control'), 'w') as f:
+                f.write('+cpu')
+            os.makedirs(cgroup_path, exist_ok=True)
+            period = 100000
+            with open(os.path.join(cgroup_path, 'cpu.max'), 'w') as f:
+                f.write(f'{int(self.cgroup_cpu_quota * period)} {period}')
+            with open(os.path.join(cgroup_path, 'cgroup.procs'), 'w') as f:
+                f.write(str(pid))
+            placement['cgroup'] = cgroup_path
+        except OSError as e:
+            logger.warning(f'Could not apply cgroup CPU quota for stream {stream_id}: {str(e)}')
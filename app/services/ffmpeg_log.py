@@ -0,0 +1,75 @@
+import collections
+import threading
+import time
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Substrings marking FFmpeg lines worth surfacing above DEBUG
+PROBLEM_MARKERS = ('error', 'fail', 'invalid', 'unable', 'refused', 'timed out', 'corrupt')
+
+class FfmpegLogBuffer:
+    """Bounded per-stream buffer of FFmpeg stderr with deduplicated, rate-limited logging
+
+    Every line is kept in the buffer (consecutive repeats are folded into a
+    counter). Only ``rate_limit`` distinct lines per ``interval`` seconds reach
+    the application log; the rest are summarised once per interval.
+    """
+
+    def __init__(self, stream_id, max_lines=200, rate_limit=5, interval=10):
+        self.stream_id = stream_id
+        self.rate_limit = rate_limit
+        self.interval = interval
+        self.lines = collections.deque(maxlen=max_lines)
+        self.total_lines = 0
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._logged_in_window = 0
+        self._suppressed = 0
+
+    def add(self, line):
+        """Record one stderr line, logging it if within the rate limit"""
+        with self._lock:
+            self.total_lines += 1
+            if self.lines and self.lines[-1]['line'] == line:
+                self.lines[-1]['repeat'] += 1
+                self.lines[-1]['last_seen'] = datetime.utcnow().isoformat() + 'Z'
+                return
+            now = datetime.utcnow().isoformat() + 'Z'
+            self.lines.append({'line': line, 'repeat': 1, 'first_seen': now, 'last_seen': now})
+        self._emit(line)
+
+    def _emit(self, line):
+        level = logging.WARNING if any(marker in line.lower() for marker in PROBLEM_MARKERS) else logging.DEBUG
+        if not logger.isEnabledFor(level):
+            # Disabled levels must not use up the budget meant for real problems
+            return
+
+        now = time.monotonic()
+        if now - self._window_start >= self.interval:
+            self._summarise()
+            self._window_start = now
+            self._logged_in_window = 0
+
+        if self._logged_in_window >= self.rate_limit:
+            self._suppressed += 1
+            return
+        self._logged_in_window += 1
+        logger.log(level, f'FFmpeg [{self.stream_id}]: {line}')
+
+    def _summarise(self):
+        if self._suppressed:
+            logger.info(f'FFmpeg [{self.stream_id}]: suppressed {self._suppressed} lines '
+                        f'(rate limit {self.rate_limit} per {self.interval}s)')
+            self._suppressed = 0
+
+    def close(self):
+        """Flush the pending summary once the stream's stderr closes"""
+        self._summarise()
+
+    def get_lines(self, limit=None):
+        """Get the most recent buffered lines, oldest first"""
+        with self._lock:
+            lines = [dict(entry) for entry in self.lines]
+        return lines[-limit:] if limit else lines
@@ -0,0 +1,217 @@
+import queue
+import threading
+import time
+from datetime import datetime
+import logging
+import cv2
+import numpy as np
+from app.models.motion_event import MotionEventModel
+
+logger = logging.getLogger(__name__)
+
+class MotionDetector:
+    """Frame-differencing motion detector for one stream's low-rate grayscale tap
+
+    Motion episodes start when the fraction of changed pixels exceeds
+    ``motion_threshold`` and end after ``cooldown`` seconds without motion.
+    Episodes longer than ``max_duration`` are checkpointed as ``ongoing`` so
+    continuous motion (foliage, traffic) still produces events.
+    """
+
+    def __init__(self, stream_id, width, height, on_event, pixel_threshold=25,
+                 motion_threshold=0.01, cooldown=3, max_duration=5):
+        self.stream_id = stream_id
+        self.width = width
+        self.height = height
+        self.frame_size = width * height
+        self.on_event = on_event
+        self.pixel_threshold = pixel_threshold
+        self.motion_threshold = motion_threshold
+        self.cooldown = cooldown
+        self.max_duration = max_duration
+        self.frames = 0
+        self.last_score = 0.0
+        self._previous = None
+        self._episode = None
+        self._last_motion = None
+
+    @property
+    def in_motion(self):
+        return self._episode is not None
+
+    def process(self, data):
+        """Score one raw gray frame against the previous one"""
+        frame = cv2.GaussianBlur(np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width), (5, 5), 0)
+        previous, self._previous = self._previous, frame
+        self.frames += 1
+        if previous is None:
+            return
+
+        changed = cv2.absdiff(frame, previous) > self.pixel_threshold
+        score = float(np.count_nonzero(changed)) / self.frame_size
+        self.last_score = score
+        now = datetime.utcnow()
+
+        if score >= self.motion_threshold:
+            self._last_motion = now
+            if self._episode is None:
+                self._episode = {'stream_id': self.stream_id, 'started_at': now, 'peak_score': score,
+                                 'score_sum': 0.0, 'frames': 0}
+            self._episode['peak_score'] = max(self._episode['peak_score'], score)
+            self._episode['score_sum'] += score
+            self._episode['frames'] += 1
+            if (now - self._episode['started_at']).total_seconds() >= self.max_duration:
+                self.flush(ongoing=True)
+        elif self._episode and (now - self._last_motion).total_seconds() >= self.cooldown:
+            self.flush()
+
+    def flush(self, ongoing=False):
+        """End the current motion episode, if any, and report it
+
+        With ``ongoing`` the motion has not stopped; the next moving frame
+        starts a new episode continuing this one.
+        """
+        episode, self._episode = self._episode, None
+        if not episode:
+            return
+        self.on_event({
+            'stream_id': episode['stream_id'],
+            'started_at': episode['started_at'],
+            'ended_at': self._last_motion or episode['started_at'],
+            'peak_score': round(episode['peak_score'], 4),
+            'mean_score': round(episode['score_sum'] / episode['frames'], 4),
+            'motion_frames': episode['frames'],
+            'ongoing': ongoing
+        })
+
+class MotionService:
+    """Run motion detection on FFmpeg side outputs, batch events to Mongo and push them to subscribers"""
+
+    def __init__(self, width=160, height=90, fps=2, batch_interval=5, **detector_options):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.batch_interval = batch_interval
+        self.detector_options = detector_options
+        self.detectors = {}
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._subscribers = {}
+        self._subscribers_lock = threading.Lock()
+        self._writer = None
+
+    def configure(self, width, height, fps, batch_interval, **detector_options):
+        """Apply app configuration before any stream uses the tap"""
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.batch_interval = batch_interval
+        self.detector_options = detector_options
+
+    def build_output_args(self):
+        """FFmpeg options for the low-fps, low-resolution grayscale side output on stdout"""
+        return [
+            '-map', '0:v:0',
+            '-vf', f'fps={self.fps},scale={self.width}:{self.height}',
+            '-pix_fmt', 'gray',
+            '-f', 'rawvideo',
+            'pipe:1'
+        ]
+
+    def attach(self, stream_id, pipe):
+        """Read frames from an FFmpeg stdout pipe in a background thread"""
+        detector = MotionDetector(stream_id, self.width, self.height, self._on_event,
+                                  max_duration=self.batch_interval, **self.detector_options)
+        self.detectors[stream_id] = detector
+        self._ensure_writer()
+
+        def _read():
+            try:
+                while True:
+                    # The encoder blocks if this pipe fills, so never do slow work here
+                    data = pipe.read(detector.frame_size)
+                    if not data or len(data) < detector.frame_size:
+                        break
+                    detector.process(data)
+            except Exception as e:
+                logger.error(f'Motion analytics for stream {stream_id} stopped: {str(e)}')
+                # Keep draining so a full pipe never stalls the HLS output
+                while pipe.read(65536):
+                    pass
+            finally:
+                detector.flush()
+                if self.detectors.get(stream_id) is detector:
+                    del self.detectors[stream_id]
+
+        threading.Thread(target=_read, daemon=True).start()
+
+    def _on_event(self, event):
+        with self._pending_lock:
+            self._pending.append(event)
+        self._publish(event['stream_id'], MotionEventModel.serialize_event(event))
+
+    def _ensure_writer(self):
+        if self._writer:
+            return
+
+        def _write():
+            _, error = MotionEventModel.ensure_indexes()
+            if error:
+                logger.error(f'Error creating motion event indexes: {error}')
+            while True:
+                time.sleep(self.batch_interval)
+                self.flush_events()
+
+        self._writer = threading.Thread(target=_write, daemon=True)
+        self._writer.start()
+
+    def flush_events(self):
+        """Write pending events to Mongo in one batch"""
+        with self._pending_lock:
+            events, self._pending = self._pending, []
+        if not events:
+            return
+        inserted, error = MotionEventModel.insert_events(events)
+        if error:
+            logger.error(f'Error writing {len(events)} motion events: {error}')
+
+    def subscribe(self, stream_id):
+        """Register a queue receiving this stream's motion events as they end"""
+        subscriber = queue.Queue(maxsize=100)
+        with self._subscribers_lock:
+            self._subscribers.setdefault(stream_id, []).append(subscriber)
+        return subscriber
+
+    def has_subscribers(self, stream_id):
+        """Whether any client is following this stream's motion events"""
+        with self._subscribers_lock:
+            return bool(self._subscribers.get(stream_id))
+
+    def unsubscribe(self, stream_id, subscriber):
+        with self._subscribers_lock:
+            subscribers = self._subscribers.get(stream_id, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(stream_id, None)
+
+    def _publish(self, stream_id, event):
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers.get(stream_id, []))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Slow client; drop rather than block detection
+                pass
+
+    def get_status(self, stream_id):
+        """Current detector state for a stream, or None if analytics is off"""
+        detector = self.detectors.get(stream_id)
+        if not detector:
+            return None
+        return {
+            'frames': detector.frames,
+            'last_score': round(detector.last_score, 4),
+            'in_motion': detector.in_motion
+        }
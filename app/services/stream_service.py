@@ -5,16 +5,59 @@ import time
 from datetime import datetime
 import logging
 import signal
+import json
+import re
+import shutil
+import collections
+import uuid
 import psutil
+from concurrent.futures import ThreadPoolExecutor
+from app.services.encoder_placement import EncoderPlacement
+from app.services.ffmpeg_log import FfmpegLogBuffer
+from app.services.motion_service import MotionService
 
 logger = logging.getLogger(__name__)
 
 class StreamService:
+    # Probing limits used in fast-start mode. Known sources have their metadata
+    # cached from an earlier session, so only a minimal probe is needed.
+    FAST_START_PROBESIZE_KNOWN = '65536'
+    FAST_START_ANALYZEDURATION_KNOWN = '200000'  # microseconds
+    FAST_START_PROBESIZE_UNKNOWN = '500000'
+    FAST_START_ANALYZEDURATION_UNKNOWN = '1000000'  # microseconds
+    FAST_START_FIRST_SEGMENT = '0.5'  # seconds
+    SOURCE_CACHE_FILE = '.source_cache.json'
+    # Recent FFmpeg stderr kept per stream, and how many distinct lines per interval reach the log
+    FFMPEG_LOG_BUFFER_LINES = 200
+    FFMPEG_LOG_RATE_LIMIT = 5
+    FFMPEG_LOG_INTERVAL = 10  # seconds
+    # Segments listed in the playlist, plus older ones kept on disk so clips can be exported
+    HLS_SEGMENT_SECONDS = 2
+    HLS_LIST_SIZE = 5
+    HLS_RETAINED_SEGMENTS = 16
+    CLIPS_DIR = '.clips'
+
     def __init__(self, hls_output_dir):
         self.hls_output_dir = hls_output_dir
         self.active_streams = {}
+        # Kept after a stream stops so the reason it died can still be retrieved
+        self.stream_logs = {}
+        # Definitions of streams started on this node, kept after idle stops for lazy restart
+        self.stream_definitions = {}
+        # Streams stopped by the idle reaper; only these are restarted when a viewer returns
+        self.idle_stopped = set()
+        self.idle_timeout = None
+        self._idle_reaper = None
+        # Serialises start/stop per stream ID (cluster takeover vs. replayed /start, bulk starts,
+        # lazy restarts vs. the idle reaper)
+        self._stream_locks = {}
+        self._stream_locks_guard = threading.Lock()
+        self.placement = EncoderPlacement()
+        self.motion = MotionService()
         self._ensure_output_dir()
         self._cleanup_stale_streams()
+        self._source_cache_lock = threading.Lock()
+        self.source_cache = self._load_source_cache()
 
     def _ensure_output_dir(self):
         """Ensure the HLS output directory exists"""
@@ -37,8 +80,150 @@ class StreamService:
         except Exception as e:
             logger.error(f'Error cleaning up stale streams: {str(e)}')
 
-    def start_stream(self, rtsp_url, stream_id):
-        """Convert RTSP to HLS for browser compatibility"""
+    def _load_source_cache(self):
+        """Load cached source metadata from earlier sessions"""
+        cache_path = os.path.join(self.hls_output_dir, self.SOURCE_CACHE_FILE)
+        try:
+            if os.path.exists(cache_path):
+                with open(cache_path) as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f'Error loading source metadata cache: {str(e)}')
+        return {}
+
+    def _save_source_cache(self):
+        """Persist cached source metadata so it survives restarts"""
+        cache_path = os.path.join(self.hls_output_dir, self.SOURCE_CACHE_FILE)
+        try:
+            with self._source_cache_lock:
+                # Dump a copy so concurrent starts can keep updating the cache
+                snapshot = dict(self.source_cache)
+                # Per-process temp name: every gunicorn worker writes the same cache file
+                tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.error(f'Error saving source metadata cache: {str(e)}')
+
+    def _remember_source(self, rtsp_url, metadata):
+        """Cache metadata for a source that produced a playlist"""
+        if not metadata.get('streams'):
+            return
+        with self._source_cache_lock:
+            self.source_cache[rtsp_url] = {**metadata, 'updated_at': datetime.utcnow().isoformat() + 'Z'}
+        self._save_source_cache()
+
+    def _forget_source(self, rtsp_url):
+        """Drop cached metadata, e.g. when a shortened probe failed"""
+        with self._source_cache_lock:
+            removed = self.source_cache.pop(rtsp_url, None) is not None
+        if removed:
+            logger.info(f'Dropped cached source metadata for {rtsp_url}')
+            self._save_source_cache()
+
+    def _build_input_args(self, rtsp_url, fast_start):
+        """Build the FFmpeg input options for a source"""
+        if not fast_start:
+            return ['-i', rtsp_url]
+
+        cached = self.source_cache.get(rtsp_url)
+        args = []
+        if rtsp_url.startswith('rtsp://'):
+            # Prefer TCP: UDP negotiation can stall for seconds behind NAT/firewalls
+            args += ['-rtsp_transport', (cached or {}).get('transport', 'tcp')]
+        if cached:
+            args += ['-probesize', self.FAST_START_PROBESIZE_KNOWN,
+                     '-analyzeduration', self.FAST_START_ANALYZEDURATION_KNOWN]
+        else:
+            args += ['-probesize', self.FAST_START_PROBESIZE_UNKNOWN,
+                     '-analyzeduration', self.FAST_START_ANALYZEDURATION_UNKNOWN]
+        return args + ['-i', rtsp_url]
+
+    def _build_output_args(self, hls_path, fast_start):
+        """Build the FFmpeg encoder and HLS muxer options"""
+        args = ['-c:v', 'libx264']
+        if fast_start:
+            # Zero-latency tuning and a forced keyframe at the first segment boundary let the
+            # muxer cut a short first segment; after that keyframes follow the segment cadence
+            args += ['-tune', 'zerolatency',
+                     '-force_key_frames',
+                     f'expr:gte(t,{self.FAST_START_FIRST_SEGMENT}+n_forced*{self.HLS_SEGMENT_SECONDS})']
+        args += ['-c:a', 'aac', '-f', 'hls']
+        if fast_start:
+            args += ['-hls_init_time', self.FAST_START_FIRST_SEGMENT]
+        args += [
+            '-hls_time', str(self.HLS_SEGMENT_SECONDS),
+            '-hls_list_size', str(self.HLS_LIST_SIZE),
+            '-hls_delete_threshold', str(self.HLS_RETAINED_SEGMENTS - self.HLS_LIST_SIZE),
+            '-hls_flags', 'delete_segments',
+            '-hls_segment_filename', os.path.join(hls_path, 'segment_%03d.ts'),
+            os.path.join(hls_path, 'playlist.m3u8')
+        ]
+        return args
+
+    def _watch_first_playlist(self, stream_id, info, timeout=30):
+        """Record the time until FFmpeg writes the first playlist"""
+        playlist_path = os.path.join(info['hls_path'], 'playlist.m3u8')
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and info['process'].poll() is None:
+            if os.path.exists(playlist_path):
+                info['time_to_first_playlist'] = round(time.monotonic() - info['start_monotonic'], 3)
+                info['first_playlist'].set()
+                logger.info(f"Stream {stream_id} first playlist after {info['time_to_first_playlist']}s")
+                self._remember_source(info['rtsp_url'], info['source_metadata'])
+                return
+            time.sleep(0.05)
+
+        if info['fast_start'] and info['rtsp_url'] in self.source_cache:
+            # The shortened probe did not work for this source, so probe fully next time
+            self._forget_source(info['rtsp_url'])
+
+    def _clear_hls_output(self, hls_path):
+        """Remove a previous run's playlist and segments so they are not mistaken for new output"""
+        for name in os.listdir(hls_path):
+            if name == 'playlist.m3u8' or name.endswith('.ts') or name.endswith('.m3u8.tmp'):
+                try:
+                    os.remove(os.path.join(hls_path, name))
+                except FileNotFoundError:
+                    pass
+
+    def wait_for_playlist(self, stream_id, timeout):
+        """Block until the stream's first playlist exists, FFmpeg exits or the timeout expires"""
+        info = self.active_streams.get(stream_id)
+        if not info:
+            return False
+        deadline = time.monotonic() + timeout
+        while not info['first_playlist'].wait(min(0.1, max(0, deadline - time.monotonic()))):
+            # A dead encoder never writes a playlist
+            if info['process'].poll() is not None or time.monotonic() >= deadline:
+                return False
+        return True
+
+    def _stream_lock(self, stream_id):
+        """Get the re-entrant lock guarding start/stop of one stream"""
+        with self._stream_locks_guard:
+            return self._stream_locks.setdefault(stream_id, threading.RLock())
+
+    def start_stream(self, rtsp_url, stream_id, fast_start=False, analytics=False, reuse_running=False):
+        """Convert RTSP to HLS for browser compatibility
+
+        With ``reuse_running``, a stream already running with the same definition
+        is kept as is instead of being restarted.
+        """
+        with self._stream_lock(stream_id):
+            if reuse_running and self._is_running(stream_id, rtsp_url, fast_start, analytics):
+                logger.info(f'Stream {stream_id} is already running with the same definition')
+                return True
+            return self._start_stream(rtsp_url, stream_id, fast_start, analytics)
+
+    def _is_running(self, stream_id, rtsp_url, fast_start, analytics):
+        """Whether the stream's encoder is alive with the given definition"""
+        info = self.active_streams.get(stream_id)
+        return bool(info) and info['process'].poll() is None and (
+            (info['rtsp_url'], info['fast_start'], info['analytics']) == (rtsp_url, fast_start, analytics))
+
+    def _start_stream(self, rtsp_url, stream_id, fast_start, analytics):
         try:
             # Stop existing stream with same ID
             if stream_id in self.active_streams:
@@ -48,38 +233,68 @@ class StreamService:
             hls_path = os.path.join(self.hls_output_dir, stream_id)
             if not os.path.exists(hls_path):
                 os.makedirs(hls_path)
+            else:
+                self._clear_hls_output(hls_path)
 
             # FFmpeg command to convert RTSP to HLS
-            command = [
-                'ffmpeg',
-                '-i', rtsp_url,
-                '-c:v', 'libx264',
-                '-c:a', 'aac',
-                '-f', 'hls',
-                '-hls_time', '2',
-                '-hls_list_size', '5',
-                '-hls_flags', 'delete_segments',
-                '-hls_segment_filename', os.path.join(hls_path, 'segment_%03d.ts'),
-                os.path.join(hls_path, 'playlist.m3u8')
-            ]
+            self.idle_stopped.discard(stream_id)
+            self.stream_definitions[stream_id] = {'rtsp_url': rtsp_url, 'fast_start': fast_start,
+                                                  'analytics': analytics}
+
+            # -nostats drops the per-frame progress line that would otherwise flood stderr
+            command = (['ffmpeg', '-nostats']
+                       + self._build_input_args(rtsp_url, fast_start)
+                       + self._build_output_args(hls_path, fast_start))
+            if analytics:
+                # Low-rate grayscale side output from the same decode, read from stdout
+                command += self.motion.build_output_args()
+            start_monotonic = time.monotonic()
+
+            # Pin the encoder to a core set at lower priority than the API workers
+            placement = self.placement.assign(stream_id)
+            popen_command, applied = self.placement.wrap_command(command, placement)
 
             # Start FFmpeg process
             process = subprocess.Popen(
-                command,
-                stdout=subprocess.DEVNULL,
+                popen_command,
+                stdout=subprocess.PIPE if analytics else subprocess.DEVNULL,
                 stderr=subprocess.PIPE,
                 stdin=subprocess.PIPE,
-                preexec_fn=os.setsid  # Create process group for proper cleanup
+                start_new_session=True  # Create process group for proper cleanup
             )
+            self.placement.apply_after_spawn(process.pid, placement, applied)
+            self.placement.apply_cgroup(stream_id, process.pid)
+            if analytics:
+                self.motion.attach(stream_id, process.stdout)
+
+            source_metadata = {'streams': []}
+            if '-rtsp_transport' in command:
+                source_metadata['transport'] = command[command.index('-rtsp_transport') + 1]
+
+            log_buffer = FfmpegLogBuffer(stream_id, self.FFMPEG_LOG_BUFFER_LINES,
+                                         self.FFMPEG_LOG_RATE_LIMIT, self.FFMPEG_LOG_INTERVAL)
+            self.stream_logs[stream_id] = log_buffer
 
             # Log FFmpeg stderr in a separate thread (filter out verbose version info)
             def _log_stderr(proc):
+                in_input_section = False
                 for line in proc.stderr:
-                    decoded_line = line.decode().strip()
+                    decoded_line = line.decode(errors='replace').strip()
+                    # Capture input stream metadata for the fast-start cache
+                    if decoded_line.startswith('Input #'):
+                        in_input_section = True
+                        source_metadata['format'] = decoded_line.split(',')[1].strip() if ',' in decoded_line else None
+                    elif decoded_line.startswith('Output #'):
+                        in_input_section = False
+                    elif in_input_section and decoded_line.startswith('Stream #'):
+                        match = re.search(r'(Video|Audio): (\w+)', decoded_line)
+                        if match:
+                            source_metadata['streams'].append({'type': match.group(1).lower(), 'codec': match.group(2)})
                     # Skip version/build info lines
                     if not any(skip in decoded_line for skip in ['ffmpeg version', 'built with', 'configuration:', 'lib']):
                         if decoded_line:  # Only log non-empty lines
-                            logger.error(f'FFmpeg: {decoded_line}')
+                            log_buffer.add(decoded_line)
+                log_buffer.close()
             threading.Thread(target=_log_stderr, args=(process,), daemon=True).start()
 
             self.active_streams[stream_id] = {
@@ -87,9 +302,23 @@ class StreamService:
                 'started_at': datetime.utcnow(),
                 'hls_path': hls_path,
                 'rtsp_url': rtsp_url,
-                'command': command
+                'command': command,
+                'fast_start': fast_start,
+                'analytics': analytics,
+                'source_metadata': source_metadata,
+                'start_monotonic': start_monotonic,
+                'first_playlist': threading.Event(),
+                'time_to_first_playlist': None,
+                'last_accessed': time.time(),
+                'placement': placement
             }
 
+            threading.Thread(
+                target=self._watch_first_playlist,
+                args=(stream_id, self.active_streams[stream_id]),
+                daemon=True
+            ).start()
+
             # Monitor process in separate thread
             monitor_thread = threading.Thread(
                 target=self._monitor_process,
@@ -106,10 +335,21 @@ class StreamService:
             # Clean up on failure
             if stream_id in self.active_streams:
                 del self.active_streams[stream_id]
+            self.stream_definitions.pop(stream_id, None)
+            self.placement.release(stream_id)
             return False
 
-    def stop_stream(self, stream_id):
+    def stop_stream(self, stream_id, keep_definition=False):
         """Stop a running stream"""
+        with self._stream_lock(stream_id):
+            return self._stop_stream(stream_id, keep_definition)
+
+    def _stop_stream(self, stream_id, keep_definition):
+        # A stream stopped while idle counts as stopped once its definition is forgotten
+        was_idle = stream_id in self.idle_stopped
+        if not keep_definition:
+            self.stream_definitions.pop(stream_id, None)
+            self.idle_stopped.discard(stream_id)
         if stream_id in self.active_streams:
             try:
                 process = self.active_streams[stream_id]['process']
@@ -131,6 +371,7 @@ class StreamService:
                     shutil.rmtree(hls_path)
 
                 del self.active_streams[stream_id]
+                self.placement.release(stream_id)
                 logger.info(f'Stopped stream: {stream_id}')
                 return True
 
@@ -144,29 +385,258 @@ class StreamService:
                     except:
                         pass
                     del self.active_streams[stream_id]
+                self.placement.release(stream_id)
                 return False
-        return False
+        return was_idle and not keep_definition
 
     def _monitor_process(self, stream_id, process):
         """Monitor FFmpeg process and clean up if it dies"""
         try:
-            # Wait for process to complete
-            stdout, stderr = process.communicate(timeout=5)
+            # Wait for process to complete; stderr is consumed by the log thread
+            process.wait()
 
             if process.returncode != 0:
                 logger.error(f"Stream {stream_id} process exited with code {process.returncode}")
-                if stderr:
-                    logger.error(f"FFmpeg error: {stderr.decode('utf-8')}")
-        except subprocess.TimeoutExpired:
-            # Process is still running, continue monitoring
-            pass
+                log_buffer = self.stream_logs.get(stream_id)
+                if log_buffer:
+                    for entry in log_buffer.get_lines(limit=5):
+                        logger.error(f"FFmpeg [{stream_id}]: {entry['line']}")
         except Exception as e:
             logger.error(f"Error monitoring stream {stream_id}: {e}")
 
-        # Clean up if process died
-        if stream_id in self.active_streams and process.poll() is not None:
-            logger.info(f"Stream {stream_id} process terminated")
-            del self.active_streams[stream_id]
+        # Clean up if process died, unless the stream has been stopped or restarted meanwhile
+        with self._stream_lock(stream_id):
+            info = self.active_streams.get(stream_id)
+            if info and info['process'] is process and process.poll() is not None:
+                logger.info(f"Stream {stream_id} process terminated")
+                del self.active_streams[stream_id]
+                # Exited on its own (e.g. dead source): viewers must not respawn it
+                self.stream_definitions.pop(stream_id, None)
+                self.placement.release(stream_id)
+
+    def record_access(self, stream_id):
+        """Record that a viewer fetched the stream's playlist or a segment"""
+        info = self.active_streams.get(stream_id)
+        if info:
+            info['last_accessed'] = time.time()
+
+    def ensure_stream(self, stream_id, timeout=5):
+        """Lazily restart a known stream that the idle reaper stopped
+
+        Also records the access under the stream's lock, so the idle reaper
+        cannot stop the stream between this check and the response. Streams
+        whose encoder exited on its own are not restarted.
+        """
+        if stream_id not in self.active_streams and stream_id not in self.idle_stopped:
+            return False
+
+        # Concurrent viewers must not each spawn an encoder
+        with self._stream_lock(stream_id):
+            if stream_id in self.active_streams:
+                self.record_access(stream_id)
+                return True
+            definition = self.stream_definitions.get(stream_id)
+            if stream_id not in self.idle_stopped or not definition:
+                return False
+            logger.info(f'Restarting idle stream {stream_id} on viewer request')
+            if not self.start_stream(definition['rtsp_url'], stream_id, fast_start=definition['fast_start'],
+                                     analytics=definition['analytics']):
+                return False
+        return self.wait_for_playlist(stream_id, timeout)
+
+    def start_idle_reaper(self, idle_timeout, interval=10):
+        """Stop streams nobody has watched for idle_timeout seconds"""
+        if not idle_timeout or idle_timeout <= 0 or self._idle_reaper:
+            return
+        self.idle_timeout = idle_timeout
+
+        def _reap():
+            while True:
+                time.sleep(interval)
+                now = time.time()
+                for stream_id, info in list(self.active_streams.items()):
+                    # Analytics keeps running without HLS viewers; nothing would restart it
+                    if info['analytics'] or self.motion.has_subscribers(stream_id):
+                        continue
+                    if now - info['last_accessed'] <= self.idle_timeout:
+                        continue
+                    with self._stream_lock(stream_id):
+                        # Re-check under the lock ensure_stream uses; a viewer may just have arrived
+                        info = self.active_streams.get(stream_id)
+                        if not info or time.time() - info['last_accessed'] <= self.idle_timeout:
+                            continue
+                        logger.info(f'Stopping stream {stream_id}: no viewers for {self.idle_timeout}s')
+                        self.stop_stream(stream_id, keep_definition=True)
+                        self.idle_stopped.add(stream_id)
+
+        self._idle_reaper = threading.Thread(target=_reap, daemon=True)
+        self._idle_reaper.start()
+
+    def _list_completed_segments(self, hls_path):
+        """List (path, duration) of finished segments on disk, oldest first
+
+        The playlist gives the newest finished segment and exact durations;
+        older retained segments are assumed to have the nominal duration.
+        """
+        with open(os.path.join(hls_path, 'playlist.m3u8')) as f:
+            playlist = f.read()
+
+        durations = {}
+        duration = None
+        for line in playlist.splitlines():
+            if line.startswith('#EXTINF:'):
+                duration = float(line[len('#EXTINF:'):].split(',')[0])
+            elif line and not line.startswith('#'):
+                durations[os.path.basename(line)] = duration
+        if not durations:
+            return []
+
+        def _number(name):
+            match = re.match(r'segment_(\d+)\.ts$', name)
+            return int(match.group(1)) if match else None
+
+        newest = max(_number(name) for name in durations)
+        segments = sorted((number, name) for name in os.listdir(hls_path)
+                          for number in [_number(name)] if number is not None and number <= newest)
+        return [(os.path.join(hls_path, name), durations.get(name) or self.HLS_SEGMENT_SECONDS)
+                for _, name in segments]
+
+    def hold_segments(self, stream_id, seconds):
+        """Hard-link the newest segments covering ``seconds`` so FFmpeg's deletion cannot remove them
+
+        Returns (hold_dir, segment_paths, duration), or None if the stream has no segments.
+        """
+        info = self.active_streams.get(stream_id)
+        hls_path = info['hls_path'] if info else os.path.join(self.hls_output_dir, stream_id)
+        try:
+            segments = self._list_completed_segments(hls_path)
+        except FileNotFoundError:
+            return None
+
+        selected = []
+        duration = 0.0
+        for path, segment_duration in reversed(segments):
+            if duration >= seconds:
+                break
+            selected.insert(0, path)
+            duration += segment_duration
+
+        hold_dir = os.path.join(self.hls_output_dir, self.CLIPS_DIR, uuid.uuid4().hex)
+        os.makedirs(hold_dir)
+        held = []
+        for path in selected:
+            target = os.path.join(hold_dir, os.path.basename(path))
+            try:
+                # A hard link keeps the data alive after FFmpeg unlinks the original
+                os.link(path, target)
+            except FileNotFoundError:
+                # Deleted between listing and linking; only the oldest can be affected
+                continue
+            except OSError:
+                shutil.copyfile(path, target)
+            held.append(target)
+
+        if not held:
+            self.release_segments(hold_dir)
+            return None
+        return hold_dir, held, round(duration, 2)
+
+    def release_segments(self, hold_dir):
+        """Release segments held for an export"""
+        shutil.rmtree(hold_dir, ignore_errors=True)
+
+    def export_clip(self, stream_id, seconds, chunk_size=65536):
+        """Remux the newest retained segments into a fragmented MP4, yielding it as it is produced
+
+        Returns ((generator, duration, cleanup), None) on success, (None, None) if
+        there is nothing to export, or (None, error) if the remux fails to produce
+        output. FFmpeg is started and its first chunk read before returning, so a
+        failure surfaces as an error rather than an empty response. ``cleanup``
+        kills FFmpeg and releases the held segments; the generator calls it when
+        it finishes, but callers must also call it on close since the body may
+        never be iterated (e.g. HEAD requests).
+        Audio and video are copied, not re-encoded, so an export costs almost no CPU.
+        """
+        held = self.hold_segments(stream_id, seconds)
+        if not held:
+            return None, None
+        hold_dir, segments, duration = held
+
+        command = [
+            'ffmpeg', '-nostats', '-loglevel', 'error',
+            '-i', 'concat:' + '|'.join(segments),
+            '-c', 'copy',
+            '-bsf:a', 'aac_adtstoasc',
+            # Fragmented MP4 needs no seeking, so it can be written to a pipe
+            '-movflags', 'frag_keyframe+empty_moov+default_base_moof',
+            '-f', 'mp4', 'pipe:1'
+        ]
+
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       stdin=subprocess.DEVNULL)
+        except OSError as e:
+            self.release_segments(hold_dir)
+            logger.error(f'Clip export for stream {stream_id} could not start FFmpeg: {str(e)}')
+            return None, f'Could not start FFmpeg: {str(e)}'
+
+        # Remux errors go to the stream's FFmpeg log buffer (or the app log if it has none)
+        stderr_tail = collections.deque(maxlen=5)
+
+        def _log_stderr():
+            log_buffer = self.stream_logs.get(stream_id)
+            for line in process.stderr:
+                decoded_line = line.decode(errors='replace').strip()
+                if not decoded_line:
+                    continue
+                stderr_tail.append(decoded_line)
+                if log_buffer:
+                    log_buffer.add(f'clip export: {decoded_line}')
+                else:
+                    logger.warning(f'FFmpeg clip export [{stream_id}]: {decoded_line}')
+        stderr_thread = threading.Thread(target=_log_stderr, daemon=True)
+        stderr_thread.start()
+
+        def _cleanup():
+            if process.poll() is None:
+                # Client disconnected mid-export, or the body was never read
+                process.kill()
+            process.wait()
+            process.stdout.close()
+            self.release_segments(hold_dir)
+
+        first_chunk = process.stdout.read(chunk_size)
+        if not first_chunk:
+            _cleanup()
+            stderr_thread.join(timeout=1)
+            error = f'Remux failed with exit code {process.returncode}'
+            if stderr_tail:
+                error += f': {stderr_tail[-1]}'
+            logger.error(f'Clip export for stream {stream_id}: {error}')
+            return None, error
+
+        def _stream():
+            try:
+                yield first_chunk
+                while True:
+                    chunk = process.stdout.read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+                if process.wait() != 0:
+                    logger.error(f'Clip export for stream {stream_id} exited with code {process.returncode}')
+            finally:
+                _cleanup()
+
+        logger.info(f'Exporting {duration}s clip from stream {stream_id} ({len(segments)} segments)')
+        return (_stream(), duration, _cleanup), None
+
+    def get_stream_logs(self, stream_id, limit=None):
+        """Get recent FFmpeg stderr lines for a stream, or None if it never ran"""
+        log_buffer = self.stream_logs.get(stream_id)
+        if not log_buffer:
+            return None
+        return {'lines': log_buffer.get_lines(limit), 'total_lines': log_buffer.total_lines}
 
     def get_stream_info(self, stream_id):
         """Get information about a specific stream"""
@@ -188,13 +658,73 @@ class StreamService:
                 'rtsp_url': info['rtsp_url'],
                 'started_at': info['started_at'].isoformat() + 'Z',
                 'status': 'running' if process.poll() is None else 'stopped',
-                'playlist_url': self.get_hls_playlist_url(stream_id)
+                'playlist_url': self.get_hls_playlist_url(stream_id),
+                'fast_start': info['fast_start'],
+                'source_cached': info['rtsp_url'] in self.source_cache,
+                'time_to_first_playlist': info['time_to_first_playlist'],
+                'idle_seconds': round(time.time() - info['last_accessed'], 1),
+                'placement': info['placement'],
+                'analytics': self.motion.get_status(stream_id) if info['analytics'] else None
             })
         return active_streams_info
 
+    def start_streams(self, definitions, max_workers=8, capacity=None, wait_timeout=5):
+        """Start several streams concurrently through a bounded worker pool
+
+        Streams beyond ``capacity`` concurrently running streams are rejected.
+        Returns one result dict per definition, in order.
+        """
+        results = [None] * len(definitions)
+        accepted = []
+        running = set(self.active_streams)
+        for index, definition in enumerate(definitions):
+            stream_id = definition['stream_id']
+            # Restarting an already running stream does not take a new slot
+            if capacity is not None and stream_id not in running and len(running) >= capacity:
+                results[index] = {'stream_id': stream_id, 'status': 'rejected',
+                                  'error': f'Capacity of {capacity} concurrent streams reached'}
+                continue
+            running.add(stream_id)
+            accepted.append(index)
+
+        def _start(definition):
+            stream_id = definition['stream_id']
+            if not self.start_stream(definition['rtsp_url'], stream_id,
+                                     fast_start=definition.get('fast_start', False),
+                                     analytics=definition.get('analytics', False)):
+                return {'stream_id': stream_id, 'status': 'failed', 'error': 'Failed to start stream'}
+            ready = self.wait_for_playlist(stream_id, wait_timeout)
+            info = self.get_stream_info(stream_id)
+            return {
+                'stream_id': stream_id,
+                'status': 'started',
+                'playlist_ready': ready,
+                'playlist_url': self.get_hls_playlist_url(stream_id),
+                'time_to_first_playlist': info['time_to_first_playlist'] if info else None
+            }
+
+        if accepted:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {index: pool.submit(_start, definitions[index]) for index in accepted}
+                for index, future in futures.items():
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        logger.error(f"Error starting stream {definitions[index]['stream_id']}: {e}")
+                        results[index] = {'stream_id': definitions[index]['stream_id'],
+                                          'status': 'failed', 'error': str(e)}
+        return results
+
+    def stop_streams(self, stream_ids, max_workers=8):
+        """Stop several streams concurrently through a bounded worker pool"""
+        if not stream_ids:
+            return []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            stopped = list(pool.map(self.stop_stream, stream_ids))
+        return [{'stream_id': stream_id, 'status': 'stopped' if success else 'not_found'}
+                for stream_id, success in zip(stream_ids, stopped)]
+
     def stop_all_streams(self):
         """Stop all active streams"""
-        stream_ids = list(self.active_streams.keys())
-        for stream_id in stream_ids:
-            self.stop_stream(stream_id)
+        self.stop_streams(list(self.active_streams.keys()))
         logger.info('Stopped all active streams')
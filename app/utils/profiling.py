@@ -0,0 +1,322 @@
+import collections
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from pymongo import monitoring
+import redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Header or query flag requesting a sampling profile of a single request
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_FLAG = '__profile'
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+
+def is_admin_request(app):
+    """Whether the request carries the configured admin token"""
+    token = app.config.get('ADMIN_TOKEN')
+    supplied = request.headers.get(ADMIN_TOKEN_HEADER, '')
+    # Compare bytes: compare_digest rejects non-ASCII str
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+def add_stage_time(stage, seconds):
+    """Add time spent in a stage (mongo, serialization, file_io) to the current request"""
+    if has_request_context() and hasattr(g, 'profile_stages'):
+        g.profile_stages[stage] = g.profile_stages.get(stage, 0.0) + seconds
+
+@contextmanager
+def timed_stage(stage):
+    """Time a block of code as part of the current request's stage breakdown"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage_time(stage, time.perf_counter() - start)
+
+class MongoStageListener(monitoring.CommandListener):
+    """Attribute MongoDB command time to the request issuing it"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        add_stage_time('mongo', event.duration_micros / 1e6)
+
+    def failed(self, event):
+        add_stage_time('mongo', event.duration_micros / 1e6)
+
+class TimingJSONProvider(DefaultJSONProvider):
+    """JSON provider recording serialization time per request"""
+
+    def dumps(self, obj, **kwargs):
+        with timed_stage('serialization'):
+            return super().dumps(obj, **kwargs)
+
+class StackSampler:
+    """Sample Python stacks and aggregate them in collapsed (flame graph) format
+
+    Collapsed output has one line per unique stack, frames joined by ';'
+    outermost first, followed by the sample count - the input format of
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.counts = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids and thread_id not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                self.counts[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.counts.most_common())
+
+class ProfileStore:
+    """Profiling records shared by all workers through Redis
+
+    Each gunicorn worker profiles itself, but the admin request fetching a
+    result can land on any worker. Without Redis (or while it is unreachable)
+    records are kept in this worker's memory only; every record carries the
+    pid of the worker that produced it.
+    """
+
+    KEY_PREFIX = 'livesitter:profile:'
+    TTL = 3600  # seconds
+
+    def __init__(self, redis_url=None, history=20):
+        self.client = redis.Redis.from_url(redis_url, decode_responses=True, socket_timeout=1,
+                                           socket_connect_timeout=1) if redis_url else None
+        self.history = history
+        self._records = collections.defaultdict(collections.OrderedDict)
+        self._slow = collections.deque(maxlen=history * 5)
+
+    def _redis(self, operation, *args):
+        if not self.client:
+            return None
+        try:
+            return operation(*args)
+        except redis.RedisError as e:
+            logger.warning(f'Profile store unavailable, using worker memory: {str(e)}')
+            return None
+
+    def put(self, kind, record_id, record):
+        """Store a profile ('request') or worker sample ('sample') record"""
+        def _put():
+            index_key = f'{self.KEY_PREFIX}{kind}'
+            pipe = self.client.pipeline()
+            pipe.set(f'{index_key}:{record_id}', json.dumps(record), ex=self.TTL)
+            pipe.lrem(index_key, 0, record_id)
+            pipe.lpush(index_key, record_id)
+            pipe.ltrim(index_key, 0, self.history - 1)
+            pipe.execute()
+            return True
+        if self._redis(_put):
+            return
+        records = self._records[kind]
+        records[record_id] = record
+        records.move_to_end(record_id)
+        while len(records) > self.history:
+            records.popitem(last=False)
+
+    def get(self, kind, record_id):
+        """Get a record by id, or None"""
+        stored = self._redis(lambda: self.client.get(f'{self.KEY_PREFIX}{kind}:{record_id}') or '')
+        if stored:
+            return json.loads(stored)
+        return self._records[kind].get(record_id)
+
+    def get_recent(self, kind):
+        """List records of a kind, newest first"""
+        def _list():
+            index_key = f'{self.KEY_PREFIX}{kind}'
+            record_ids = self.client.lrange(index_key, 0, -1)
+            stored = self.client.mget([f'{index_key}:{record_id}' for record_id in record_ids]) if record_ids else []
+            return [json.loads(record) for record in stored if record]
+        records = self._redis(_list)
+        return records if records is not None else list(reversed(self._records[kind].values()))
+
+    def add_slow(self, record):
+        """Record a slow request"""
+        def _add():
+            key = f'{self.KEY_PREFIX}slow'
+            pipe = self.client.pipeline()
+            pipe.lpush(key, json.dumps(record))
+            pipe.ltrim(key, 0, self.history * 5 - 1)
+            pipe.expire(key, self.TTL)
+            pipe.execute()
+            return True
+        if not self._redis(_add):
+            self._slow.append(record)
+
+    def list_slow(self):
+        """List recent slow requests, newest first"""
+        stored = self._redis(lambda: self.client.lrange(f'{self.KEY_PREFIX}slow', 0, -1))
+        if stored is not None:
+            return [json.loads(record) for record in stored]
+        return list(reversed(self._slow))
+
+class RequestProfiler:
+    """Per-request stage timing, opt-in sampling profiles and slow-request capture"""
+
+    def __init__(self):
+        self.slow_threshold = None
+        self.request_interval = 0.001
+        self.store = ProfileStore()
+        self._worker_sampling = threading.Lock()
+        self._app = None
+
+    def init_app(self, app):
+        """Register request hooks, the Mongo listener and the timing JSON provider
+
+        Must run before the Mongo client is created, since command listeners
+        only apply to clients constructed after registration.
+        """
+        self._app = app
+        self.slow_threshold = app.config.get('SLOW_REQUEST_THRESHOLD_MS')
+        redis_url = app.config.get('REDIS_URL') if app.config.get('PROFILE_STORE', 'redis') == 'redis' else None
+        self.store = ProfileStore(redis_url, app.config.get('PROFILE_HISTORY', 20))
+        monitoring.register(MongoStageListener())
+        app.json = TimingJSONProvider(app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _wants_profile(self):
+        flagged = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_FLAG)
+        return bool(flagged) and is_admin_request(self._app)
+
+    def _before_request(self):
+        g.profile_stages = {}
+        g.profile_start = time.perf_counter()
+        g.profile_sampler = None
+        if self._wants_profile():
+            g.profile_sampler = StackSampler(self.request_interval, {threading.get_ident()}).start()
+
+    def _after_request(self, response):
+        if not hasattr(g, 'profile_start'):
+            return response
+
+        stages = g.profile_stages
+        sampler = g.profile_sampler
+        handler_seconds = time.perf_counter() - g.profile_start
+        record = {
+            'pid': os.getpid(),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'handler_ms': round(handler_seconds * 1000, 2),
+            'stages_ms': stages
+        }
+
+        if sampler:
+            profile_id = uuid.uuid4().hex
+            response.headers['X-Profile-Id'] = profile_id
+            if response.is_streamed or response.direct_passthrough:
+                # Time file I/O (send_file playlists and segments) while the body is streamed.
+                # Only for profiled requests: it replaces the server's sendfile-capable file wrapper
+                response.response = self._timed_body(response.response, stages)
+                response.direct_passthrough = False
+
+        started = g.profile_start
+
+        def _finish():
+            if sampler:
+                sampler.stop()
+            total_ms = (time.perf_counter() - started) * 1000
+            record['total_ms'] = round(total_ms, 2)
+            record['stages_ms'] = {stage: round(seconds * 1000, 2) for stage, seconds in stages.items()}
+            if sampler:
+                record['id'] = profile_id
+                record['samples'] = sampler.samples
+                record['collapsed'] = sampler.collapsed()
+                self.store.put('request', profile_id, record)
+            # Long-lived event streams are slow by design
+            if self.slow_threshold and total_ms > self.slow_threshold and response.mimetype != 'text/event-stream':
+                logger.warning(f"Slow request {record['method']} {record['path']}: "
+                               f"{record['total_ms']}ms {record['stages_ms']}")
+                self.store.add_slow({**record, 'captured_at': time.time()})
+
+        response.call_on_close(_finish)
+        return response
+
+    @staticmethod
+    def _timed_body(body, stages):
+        iterator = iter(body)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stages['file_io'] = stages.get('file_io', 0.0) + time.perf_counter() - start
+                yield chunk
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    def start_worker_sample(self, seconds, interval=0.005):
+        """Sample every thread of this worker in the background for a fixed time
+
+        Returns the sample record, or None if this worker is already sampling.
+        The request thread is not held, so the worker keeps serving the
+        traffic being profiled. The result is written to the profile store.
+        """
+        if not self._worker_sampling.acquire(blocking=False):
+            return None
+
+        sample_id = uuid.uuid4().hex
+        record = {'id': sample_id, 'pid': os.getpid(), 'status': 'running', 'seconds': seconds,
+                  'started_at': time.time()}
+
+        def _run():
+            try:
+                sampler = StackSampler(interval).start()
+                time.sleep(seconds)
+                sampler.stop()
+                self.store.put('sample', sample_id, {**record, 'status': 'done', 'samples': sampler.samples,
+                                                     'collapsed': sampler.collapsed()})
+            except Exception as e:
+                logger.error(f'Worker sample {sample_id} failed: {str(e)}')
+                self.store.put('sample', sample_id, {**record, 'status': 'failed'})
+            finally:
+                self._worker_sampling.release()
+
+        self.store.put('sample', sample_id, record)
+        threading.Thread(target=_run, daemon=True).start()
+        return record
+
+request_profiler = RequestProfiler()
@@ -26,3 +26,6 @@ function safeCreateCollection(name) {
 // Create collections if not exist
 safeCreateCollection('overlays');
 safeCreateCollection('settings');
+safeCreateCollection('motion_events');
+
+db.motion_events.createIndex({ stream_id: 1, started_at: -1 });